@@ -1,110 +1,225 @@
+import asyncio
 import socket
+import functools
+import itertools
 import json
-import concurrent.futures
+import statistics
+import struct
+import sys
 from typing import Dict, List, Optional
 import os
 import argparse
 import time
 from datetime import datetime
+from operator import itemgetter
+
+# Optional raw-SYN extension; needs CAP_NET_RAW, so only used when running as root
+try:
+    import _flop_syn
+except ImportError:
+    _flop_syn = None
+
+@functools.lru_cache(maxsize=1)
+def _load_ports(path: str) -> Dict:
+    """Parse the ports file once per process, preferring orjson when available"""
+    try:
+        import mmap
+        import orjson
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return orjson.loads(mm)
+            finally:
+                mm.close()
+    except Exception:
+        pass
+
+    with open(path) as f:
+        return json.load(f)
 
 class PortScanner:
     def __init__(self):
         """Initialize scanner"""
+        self.timeout = 0.5
         script_dir = os.path.dirname(os.path.abspath(__file__))
         ports_file = os.path.join(script_dir, "ports.json")
             
+        # Interned so duplicate descriptions share one string object
+        unknown = sys.intern("Unknown")
+        self._services = [unknown] * 65536
         try:
-            with open(ports_file) as f:
-                data = json.load(f)
-                self.ports_data = data["ports"]
-                print(f"Loaded {len(self.ports_data)} port entries")
+            data = _load_ports(ports_file)
+            self.ports_data = data["ports"]
+            for key, value in self.ports_data.items():
+                info = value[0] if isinstance(value, list) else value
+                self._services[int(key)] = sys.intern(info.get("description", unknown))
+            print(f"Loaded {len(self.ports_data)} port entries")
         except Exception as e:
             print(f"Warning: Could not load ports data: {e}")
             self.ports_data = {}
 
     def get_service(self, port: int) -> str:
         """Get service name for a port number"""
-        port_str = str(port)
-        try:
-            if port_str in self.ports_data:
-                port_info = self.ports_data[port_str]
-                if isinstance(port_info, list):
-                    info = port_info[0]
-                else:
-                    info = port_info
-                return info.get("description", "Unknown")
-        except (KeyError, IndexError):
-            pass
+        if 0 <= port < len(self._services):
+            return self._services[port]
         return "Unknown"
 
-    def check_port(self, host: str, port: int) -> Dict:
-        """Check if a port is open"""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.5)
-        
-        try:
-            result = sock.connect_ex((host, port))
-            sock.close()
-            
-            if result == 0:
+    async def _probe(self, host: str, port: int, sem: asyncio.Semaphore, timeout: float) -> Optional[Dict]:
+        """Probe a single port without blocking the event loop"""
+        async with sem:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # RST on close so closed probes never linger in TIME_WAIT
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            sock.setblocking(False)
+            loop = asyncio.get_running_loop()
+
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (host, port)),
+                                       timeout=timeout)
+            except (OSError, asyncio.TimeoutError):
+                pass
+            except Exception as e:
+                print(f"Error scanning port {port}: {e}")
+            else:
+                # Restore graceful close for the few ports that answered
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 0, 0))
                 service = self.get_service(port)
                 print(f"Found open port {port}: {service}")
-                return {
+                result = {
                     "port": port,
                     "status": "OPEN",
                     "service": service
                 }
-        except (socket.timeout, socket.error):
-            pass
-        finally:
-            sock.close()
-            
-        return {
-            "port": port,
-            "status": "CLOSED",
-            "service": self.get_service(port)
-        }
+                # Grab whatever the service volunteers (SSH, FTP, SMTP, ...)
+                try:
+                    banner = await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout=0.1)
+                except (OSError, asyncio.TimeoutError):
+                    banner = b""
+                if banner:
+                    result["banner"] = banner.decode("ascii", "replace").strip()
+                return result
+            finally:
+                # Detach and close the fd directly, skipping socket-object teardown
+                try:
+                    os.close(sock.detach())
+                except OSError:
+                    pass
 
-    def scan(self, host: str, start_port: int = 1, end_port: int = 65535, threads: int = 16) -> List[Dict]:
-        """Scan port range for open ports"""
-        results = []
+            return None
+
+    async def _measure_rtt(self, host: str) -> Optional[float]:
+        """Estimate connect RTT by timing probes against a high, likely-closed port"""
+        loop = asyncio.get_running_loop()
+        samples = []
+
+        for _ in range(8):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (host, 45861)),
+                                       timeout=self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            except OSError:
+                pass
+            finally:
+                sock.close()
+            samples.append(time.perf_counter() - start)
+
+        if not samples:
+            return None
+        return statistics.median(samples)
+
+    async def _scan_async(self, host: str, start_port: int, end_port: int, batch: int,
+                          results: List[Dict]) -> None:
+        """Drive all probes from a single event loop, appending OPEN results as they land"""
         ports_scanned = 0
         total_ports = end_port - start_port + 1
         start_time = time.time()
 
+        # Little's law: keep roughly target_pps * rtt probes in flight,
+        # and let dead ports fail after a few RTTs instead of 500 ms
+        timeout = self.timeout
+        rtt = await self._measure_rtt(host)
+        if rtt is not None:
+            batch = min(batch, max(64, int(50000 * rtt)))
+            timeout = min(timeout, max(3 * rtt, 0.05))
+            print(f"Measured RTT {rtt * 1000:.1f} ms - using {batch} concurrent probes, "
+                  f"{timeout * 1000:.0f} ms timeout")
+
+        # Submit probes in a sliding window so a full-range scan never
+        # materializes 65k task objects at once
+        sem = asyncio.Semaphore(batch)
+        port_iter = iter(range(start_port, end_port + 1))
+        pending = {
+            asyncio.create_task(self._probe(host, port, sem, timeout))
+            for port in itertools.islice(port_iter, batch * 2)
+        }
+
+        # Report progress from a timer so the completion loop only counts
+        loop = asyncio.get_running_loop()
+
+        def report_progress():
+            nonlocal reporter
+            elapsed = time.time() - start_time
+            rate = ports_scanned / elapsed
+            progress = (ports_scanned / total_ports) * 100
+            print(f"Progress: {progress:.1f}% ({ports_scanned}/{total_ports} ports) "
+                  f"- {rate:.0f} ports/sec")
+            reporter = loop.call_later(1.0, report_progress)
+
+        reporter = loop.call_later(1.0, report_progress)
+
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-                future_to_port = {
-                    executor.submit(self.check_port, host, port): port 
-                    for port in range(start_port, end_port + 1)
-                }
-                
-                for future in concurrent.futures.as_completed(future_to_port):
-                    try:
-                        result = future.result()
-                        ports_scanned += 1
-                        
-                        if ports_scanned % 1000 == 0:
-                            elapsed = time.time() - start_time
-                            rate = ports_scanned / elapsed
-                            progress = (ports_scanned / total_ports) * 100
-                            print(f"Progress: {progress:.1f}% ({ports_scanned}/{total_ports} ports) "
-                                  f"- {rate:.0f} ports/sec")
-                        
-                        if result["status"] == "OPEN":
-                            results.append(result)
-                    except Exception as e:
-                        port = future_to_port[future]
-                        print(f"Error scanning port {port}: {e}")
-
-        except KeyboardInterrupt:
-            print("\nScan interrupted by user. Processing results...")
-            
-        return sorted(results, key=lambda x: x["port"])
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    ports_scanned += 1
+                    if result is not None:
+                        results.append(result)
+                for port in itertools.islice(port_iter, len(done)):
+                    pending.add(asyncio.create_task(self._probe(host, port, sem, timeout)))
+        finally:
+            reporter.cancel()
 
-def generate_html_report(results: List[Dict], host: str, start_time: datetime, end_time: datetime) -> str:
-    """Generate HTML report of scan results"""
-    html = f"""
+    def scan(self, host: str, start_port: int = 1, end_port: int = 65535, batch: int = 2048) -> List[Dict]:
+        """Scan port range for open ports"""
+        try:
+            import resource
+            nofile = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+            if nofile != resource.RLIM_INFINITY and nofile < batch:
+                print(f"Warning: open-file limit {nofile} is below {batch} concurrent probes, "
+                      f"raise it with ulimit -n or lower -b")
+        except ImportError:
+            pass
+
+        # Resolve once up front so probes connect by address, not hostname
+        try:
+            addr = socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            addr = host
+
+        if _flop_syn is not None and hasattr(os, "geteuid") and os.geteuid() == 0:
+            open_ports = _flop_syn.scan(addr, list(range(start_port, end_port + 1)), batch)
+            results = [
+                {"port": port, "status": "OPEN", "service": self.get_service(port)}
+                for port in open_ports
+            ]
+        else:
+            # _scan_async fills the list in place so results collected
+            # before a Ctrl-C still get reported
+            results = []
+            try:
+                asyncio.run(self._scan_async(addr, start_port, end_port, batch, results))
+            except KeyboardInterrupt:
+                print("\nScan interrupted by user. Processing results...")
+        return sorted(results, key=itemgetter("port"))
+
+_HTML_HEADER = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -124,7 +239,7 @@ def generate_html_report(results: List[Dict], host: str, start_time: datetime, e
             <p>Target Host: {host}</p>
             <p>Start Time: {start_time}</p>
             <p>End Time: {end_time}</p>
-            <p>Duration: {(end_time - start_time).total_seconds():.2f} seconds</p>
+            <p>Duration: {duration:.2f} seconds</p>
         </div>
         <table>
             <tr>
@@ -133,28 +248,87 @@ def generate_html_report(results: List[Dict], host: str, start_time: datetime, e
                 <th>Service</th>
             </tr>
     """
-    
-    for result in results:
-        html += f"""
+
+_HTML_ROW = """
             <tr>
-                <td>{result['port']}</td>
-                <td>{result['status']}</td>
-                <td>{result['service']}</td>
+                <td>{port}</td>
+                <td>{status}</td>
+                <td>{service}</td>
             </tr>
         """
-        
-    html += """
+
+_HTML_FOOTER = """
+        </table>
+    </body>
+    </html>
+    """
+
+_JINJA_TEMPLATE = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Port Scan Report - {{ host }}</title>
+        <style>
+            body { font-family: Arial, sans-serif; margin: 20px; }
+            table { border-collapse: collapse; width: 100%; }
+            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+            th { background-color: #f2f2f2; }
+            tr:nth-child(even) { background-color: #f9f9f9; }
+            .header { margin-bottom: 20px; }
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>Port Scan Report</h1>
+            <p>Target Host: {{ host }}</p>
+            <p>Start Time: {{ start_time }}</p>
+            <p>End Time: {{ end_time }}</p>
+            <p>Duration: {{ '%.2f'|format(duration) }} seconds</p>
+        </div>
+        <table>
+            <tr>
+                <th>Port</th>
+                <th>Status</th>
+                <th>Service</th>
+            </tr>
+    {% for result in results %}
+            <tr>
+                <td>{{ result.port }}</td>
+                <td>{{ result.status }}</td>
+                <td>{{ result.service }}</td>
+            </tr>
+    {% endfor %}
         </table>
     </body>
     </html>
     """
-    return html
+
+def write_html_report(results: List[Dict], host: str, start_time: datetime, end_time: datetime, f) -> None:
+    """Write the HTML report to an open file, streaming via Jinja2 when available"""
+    try:
+        from jinja2 import Environment, DictLoader
+    except ImportError:
+        f.write(generate_html_report(results, host, start_time, end_time))
+        return
+
+    template = Environment(loader=DictLoader({'report': _JINJA_TEMPLATE})).get_template('report')
+    template.stream(results=results, host=host, start_time=start_time, end_time=end_time,
+                    duration=(end_time - start_time).total_seconds()).dump(f)
+
+def generate_html_report(results: List[Dict], host: str, start_time: datetime, end_time: datetime) -> str:
+    """Generate HTML report of scan results"""
+    parts = [_HTML_HEADER.format(host=host, start_time=start_time, end_time=end_time,
+                                 duration=(end_time - start_time).total_seconds())]
+
+    parts.extend(_HTML_ROW.format_map(result) for result in results)
+    parts.append(_HTML_FOOTER)
+    return "".join(parts)
 
 def main():
     parser = argparse.ArgumentParser(description='TCP Port Scanner')
     parser.add_argument('host', help='Target host to scan')
     parser.add_argument('-p', '--ports', help='Port range (e.g., 1-1024)', default='1-65535')
-    parser.add_argument('-t', '--threads', type=int, help='Number of threads', default=16)
+    parser.add_argument('-b', '--batch', type=int, help='Number of concurrent probes', default=2048)
     parser.add_argument('-o', '--output', help='Output file (supports .txt or .html)')
     
     args = parser.parse_args()
@@ -165,7 +339,7 @@ def main():
     print(f"Starting scan of {args.host} at {start_time}")
     
     try:
-        results = scanner.scan(args.host, start_port, end_port, args.threads)
+        results = scanner.scan(args.host, start_port, end_port, args.batch)
         end_time = datetime.now()
         
         if not results:
@@ -175,9 +349,8 @@ def main():
         # Generate reports
         if args.output:
             if args.output.endswith('.html'):
-                html_content = generate_html_report(results, args.host, start_time, end_time)
                 with open(args.output, 'w') as f:
-                    f.write(html_content)
+                    write_html_report(results, args.host, start_time, end_time, f)
             else:
                 with open(args.output, 'w') as f:
                     f.write(f"Port Scan Report for {args.host}\n")
@@ -1,10 +1,16 @@
+import asyncio
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
-import concurrent.futures
-from scanner import PortScanner, generate_html_report
+from unittest.mock import patch, mock_open, AsyncMock, ANY
+import io
+import scanner
+from scanner import PortScanner, generate_html_report, write_html_report
 from datetime import datetime
 
 class TestPortScanner(unittest.TestCase):
+    def setUp(self):
+        # Each test brings its own ports fixture via mocked open
+        scanner._load_ports.cache_clear()
+
     @patch('builtins.open', new_callable=mock_open, read_data='{"ports": {"80": {"description": "HTTP"}}}')
     @patch('os.path.join', return_value='ports.json')
     def test_init(self, mock_path_join, mock_open_file):
@@ -21,65 +27,64 @@ class TestPortScanner(unittest.TestCase):
         service = scanner.get_service(9999)
         self.assertEqual(service, "Unknown")
 
+    @patch('asyncio.get_running_loop')
     @patch('socket.socket')
     @patch('builtins.open', new_callable=mock_open, read_data='{"ports": {"80": {"description": "HTTP"}}}')
     @patch('os.path.join', return_value='ports.json')
-    def test_check_port_open(self, mock_path_join, mock_open_file, mock_socket):
-        mock_socket_instance = mock_socket.return_value
-        mock_socket_instance.connect_ex.return_value = 0
+    def test_probe_open(self, mock_path_join, mock_open_file, mock_socket, mock_get_loop):
+        mock_socket.return_value.detach.return_value = -1
+        mock_get_loop.return_value.sock_connect = AsyncMock(return_value=None)
+        mock_get_loop.return_value.sock_recv = AsyncMock(return_value=b'')
         scanner = PortScanner()
-        result = scanner.check_port('google.com', 80)
+        result = asyncio.run(scanner._probe('google.com', 80, asyncio.Semaphore(1), 0.5))
         self.assertEqual(result['status'], 'OPEN')
         self.assertEqual(result['service'], 'HTTP')
+        self.assertNotIn('banner', result)
+
+    @patch('asyncio.get_running_loop')
+    @patch('socket.socket')
+    @patch('builtins.open', new_callable=mock_open, read_data='{"ports": {"22": {"description": "SSH"}}}')
+    @patch('os.path.join', return_value='ports.json')
+    def test_probe_banner(self, mock_path_join, mock_open_file, mock_socket, mock_get_loop):
+        mock_socket.return_value.detach.return_value = -1
+        mock_get_loop.return_value.sock_connect = AsyncMock(return_value=None)
+        mock_get_loop.return_value.sock_recv = AsyncMock(return_value=b'SSH-2.0-OpenSSH_9.6\r\n')
+        scanner = PortScanner()
+        result = asyncio.run(scanner._probe('google.com', 22, asyncio.Semaphore(1), 0.5))
+        self.assertEqual(result['status'], 'OPEN')
+        self.assertEqual(result['service'], 'SSH')
+        self.assertEqual(result['banner'], 'SSH-2.0-OpenSSH_9.6')
 
+    @patch('asyncio.get_running_loop')
     @patch('socket.socket')
     @patch('builtins.open', new_callable=mock_open, read_data='{"ports": {"80": {"description": "HTTP"}}}')
     @patch('os.path.join', return_value='ports.json')
-    def test_check_port_closed(self, mock_path_join, mock_open_file, mock_socket):
-        mock_socket_instance = mock_socket.return_value
-        mock_socket_instance.connect_ex.return_value = 1
+    def test_probe_closed(self, mock_path_join, mock_open_file, mock_socket, mock_get_loop):
+        mock_socket.return_value.detach.return_value = -1
+        mock_get_loop.return_value.sock_connect = AsyncMock(side_effect=ConnectionRefusedError)
         scanner = PortScanner()
-        result = scanner.check_port('google.com', 80)
-        self.assertEqual(result['status'], 'CLOSED')
-        self.assertEqual(result['service'], 'HTTP')
+        result = asyncio.run(scanner._probe('google.com', 80, asyncio.Semaphore(1), 0.5))
+        self.assertIsNone(result)
 
-    @patch('concurrent.futures.ThreadPoolExecutor')
+    @patch('socket.getaddrinfo', return_value=[(2, 1, 6, '', ('142.250.180.14', 0))])
+    @patch.object(PortScanner, '_measure_rtt', new_callable=AsyncMock, return_value=None)
+    @patch.object(PortScanner, '_probe', new_callable=AsyncMock)
     @patch('builtins.open', new_callable=mock_open, read_data='{"ports": {"80": {"description": "HTTP"}}}')
     @patch('os.path.join', return_value='ports.json')
-    def test_scan(self, mock_path_join, mock_open_file, mock_executor):
+    def test_scan(self, mock_path_join, mock_open_file, mock_probe, mock_rtt, mock_getaddrinfo):
+        mock_probe.return_value = {'port': 80, 'status': 'OPEN', 'service': 'HTTP'}
         scanner = PortScanner()
-        
-        # Create a mock future
-        mock_future = MagicMock(spec=concurrent.futures.Future)
-        mock_future.result.return_value = {'port': 80, 'status': 'OPEN', 'service': 'HTTP'}
-        
-        # Create a mock executor instance
-        mock_executor_instance = MagicMock()
-        mock_executor.return_value.__enter__.return_value = mock_executor_instance
-        
-        # Make submit return our mock future
-        mock_executor_instance.submit.return_value = mock_future
-        
-        # Create a dictionary that maps our mock future to a port number
-        future_to_port = {mock_future: 80}
-        
-        # Mock as_completed to return our mock future
-        def mock_as_completed(futures_dict):
-            return [mock_future]
-            
-        with patch('concurrent.futures.as_completed', side_effect=mock_as_completed):
-            results = scanner.scan('google.com', start_port=80, end_port=80, threads=1)
-        
+
+        results = scanner.scan('google.com', start_port=80, end_port=80, batch=1)
+
         # Verify the results
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]['port'], 80)
         self.assertEqual(results[0]['status'], 'OPEN')
         self.assertEqual(results[0]['service'], 'HTTP')
-        
-        # Verify submit was called with correct arguments
-        mock_executor_instance.submit.assert_called_with(
-            scanner.check_port, 'google.com', 80
-        )
+
+        # Verify the probe was called with the resolved address
+        mock_probe.assert_called_with('142.250.180.14', 80, ANY, ANY)
 
 class TestGenerateHtmlReport(unittest.TestCase):
     def test_generate_html_report(self):
@@ -93,5 +98,18 @@ class TestGenerateHtmlReport(unittest.TestCase):
         self.assertIn('<td>OPEN</td>', html)
         self.assertIn('<td>HTTP</td>', html)
 
+    def test_write_html_report(self):
+        results = [{'port': 80, 'status': 'OPEN', 'service': 'HTTP'}]
+        host = 'google.com'
+        start_time = datetime(2023, 1, 1, 12, 0, 0)
+        end_time = datetime(2023, 1, 1, 12, 0, 10)
+        f = io.StringIO()
+        write_html_report(results, host, start_time, end_time, f)
+        html = f.getvalue()
+        self.assertIn('<title>Port Scan Report - google.com</title>', html)
+        self.assertIn('<td>80</td>', html)
+        self.assertIn('<td>OPEN</td>', html)
+        self.assertIn('<td>HTTP</td>', html)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file